@@ -0,0 +1,287 @@
+"""
+Batch restock notification dispatcher built on the Gmail API samples.
+
+Unlike send_message.py, which builds a service and makes one HTTP round-trip
+per email, this dispatcher:
+
+  * builds one authenticated Gmail service and reuses it for every send
+  * groups sends into Gmail batch HTTP requests (up to 50 per batch)
+  * renders the email once per product set and only substitutes the
+    recipient address and unsubscribe link for each copy
+  * throttles with a token bucket to stay within the per-user send quota,
+    never sending more messages in one batch than the bucket's burst size
+  * retries sends rejected with 429 or 5xx, with backoff, through the bucket
+
+Run against a local stub (see gmail_stub_server.py) with:
+
+  python gmail_stub_server.py --port 8089 &
+  python batch_send_messages.py notification.json --endpoint http://localhost:8089/
+
+where notification.json looks like:
+
+  {"products": [{"name": "...", "productPageUrl": "..."}],
+   "recipients": [{"email": "user@example.com", "token": "..."}]}
+"""
+
+import argparse
+import base64
+import html
+import json
+import threading
+import time
+from email.message import EmailMessage
+from string import Template
+from urllib.parse import quote
+
+import google.auth
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+GMAIL_BATCH_URI = "https://gmail.googleapis.com/batch/gmail/v1"
+# Gmail recommends at most 50 requests per batch
+MAX_BATCH_SIZE = 50
+# messages.send costs 100 quota units; the per-user limit is 250 units/sec
+DEFAULT_SEND_RATE = 2.5
+DEFAULT_MAX_RETRIES = 3
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+SUBJECT = "Amul Protein Products Back in Stock"
+
+
+class TokenBucket:
+  """Thread-safe token bucket refilled at `rate` tokens per second."""
+
+  def __init__(self, rate, capacity=None):
+    self.rate = rate
+    self.capacity = capacity or max(rate, 1)
+    self._tokens = self.capacity
+    self._updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  def acquire(self, tokens=1):
+    """Block until `tokens` tokens are available, then take them.
+
+    Requests larger than the bucket capacity are drained in capacity-sized
+    chunks, so a whole batch can be paid for with one call.
+    """
+    while tokens > 0:
+      take = min(tokens, self.capacity)
+      with self._lock:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        if self._tokens >= take:
+          self._tokens -= take
+          tokens -= take
+          continue
+        wait = (take - self._tokens) / self.rate
+      time.sleep(wait)
+
+
+def _literal(text):
+  """Escape `$` so text survives string.Template substitution unchanged."""
+  return text.replace("$", "$$")
+
+
+def render_template(products, sender=None):
+  """Render the notification once for a product set.
+
+  Returns a string.Template over the full RFC 2822 message. Only `$to` and
+  `$unsubscribe_url` are left to fill in for each recipient.
+  """
+  items = []
+  for product in products:
+    name = _literal(html.escape(product.get("name", "Unknown Product")))
+    url = product.get("productPageUrl")
+    if url:
+      items.append(f'<li><a href="{_literal(html.escape(url))}">{name}</a></li>')
+    else:
+      items.append(f"<li><strong>{name}</strong></li>")
+  body = "\n".join([
+      "<p>Good news! These Amul protein products are back in stock:</p>",
+      "<ul>",
+      *items,
+      "</ul>",
+      '<p><a href="$unsubscribe_url">Unsubscribe</a></p>',
+  ])
+
+  message = EmailMessage()
+  message["To"] = "$to"
+  if sender:
+    # Without a From header Gmail uses the authenticated account's address
+    message["From"] = _literal(sender)
+  message["Subject"] = SUBJECT
+  # 8bit keeps the placeholders literal in the serialised message
+  message.set_content(body, subtype="html", cte="8bit")
+  return Template(message.as_string())
+
+
+def personalise(template, frontend_base_url, recipient):
+  """Fill in one recipient and return the Gmail API request body."""
+  # Strip line breaks so a bad address can't inject extra headers
+  to = recipient["email"].replace("\r", "").replace("\n", "")
+  unsubscribe_url = html.escape(
+      f"{frontend_base_url.rstrip('/')}/unsubscribe"
+      f"?token={quote(recipient.get('token', ''))}"
+  )
+  raw = template.substitute(to=to, unsubscribe_url=unsubscribe_url)
+  return {"raw": base64.urlsafe_b64encode(raw.encode("utf-8")).decode()}
+
+
+def _is_retryable(exception):
+  return (
+      isinstance(exception, HttpError)
+      and exception.resp is not None
+      and exception.resp.status in RETRYABLE_STATUSES
+  )
+
+
+def build_service(endpoint=None):
+  """Build one Gmail service object to be reused for every send.
+
+  With `endpoint` set (e.g. a local stub), no credentials are loaded.
+  """
+  if endpoint:
+    return build(
+        "gmail",
+        "v1",
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": endpoint},
+        static_discovery=True,
+    )
+  creds, _ = google.auth.default()
+  return build("gmail", "v1", credentials=creds)
+
+
+class GmailBatchDispatcher:
+  """Sends personalised copies of a message through Gmail batch requests."""
+
+  def __init__(self, service, batch_uri=None, batch_size=MAX_BATCH_SIZE,
+               rate=DEFAULT_SEND_RATE, burst=None,
+               max_retries=DEFAULT_MAX_RETRIES):
+    self.service = service
+    self.batch_uri = batch_uri or GMAIL_BATCH_URI
+    # Every message in a batch counts against the quota at once, so a batch
+    # may never be larger than the bucket's burst size
+    burst = burst or max(1, int(rate))
+    self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE, burst))
+    self.bucket = TokenBucket(rate, capacity=self.batch_size)
+    self.max_retries = max_retries
+
+  def _send_round(self, template, frontend_base_url, recipients, pending,
+                  final_attempt, sent, failed):
+    """Send `pending` recipient indices once; return the indices to retry."""
+    retry = []
+    handled = set()
+
+    def callback(request_id, response, exception):
+      index = int(request_id)
+      handled.add(index)
+      email = recipients[index]["email"]
+      if exception is None:
+        sent.append({"email": email, "id": response.get("id")})
+      elif _is_retryable(exception) and not final_attempt:
+        retry.append(index)
+      else:
+        failed.append({"email": email, "error": str(exception)})
+
+    for start in range(0, len(pending), self.batch_size):
+      chunk = pending[start:start + self.batch_size]
+      self.bucket.acquire(len(chunk))
+      batch = BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+      for index in chunk:
+        body = personalise(template, frontend_base_url, recipients[index])
+        # pylint: disable=E1101
+        batch.add(
+            self.service.users().messages().send(userId="me", body=body),
+            request_id=str(index),
+        )
+      try:
+        batch.execute()
+      except HttpError as error:
+        # The batch request itself failed; its parts were never answered
+        for index in chunk:
+          if index in handled:
+            continue
+          if _is_retryable(error) and not final_attempt:
+            retry.append(index)
+          else:
+            failed.append({"email": recipients[index]["email"], "error": str(error)})
+    return retry
+
+  def dispatch(self, template, frontend_base_url, recipients):
+    """Send one message per recipient and return delivery stats."""
+    sent = []
+    failed = []
+    retried = 0
+
+    started = time.monotonic()
+    pending = list(range(len(recipients)))
+    for attempt in range(self.max_retries + 1):
+      pending = self._send_round(
+          template, frontend_base_url, recipients, pending,
+          attempt == self.max_retries, sent, failed,
+      )
+      if not pending:
+        break
+      retried += len(pending)
+      # Back off before retrying rate-limited or failed sends
+      time.sleep(min(30, 2 ** attempt))
+    elapsed = time.monotonic() - started
+
+    return {
+        "sent": len(sent),
+        "failed": len(failed),
+        "retried": retried,
+        "failures": failed,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(len(sent) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Batch Gmail restock notifier")
+  parser.add_argument("notification", help="JSON file with products and recipients")
+  parser.add_argument("--sender", default=None)
+  parser.add_argument("--frontend-base-url", default="http://localhost:3000")
+  parser.add_argument("--endpoint", default=None,
+                      help="Gmail API root URL, e.g. a local stub server")
+  parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE)
+  parser.add_argument("--rate", type=float, default=DEFAULT_SEND_RATE,
+                      help="Maximum messages sent per second")
+  parser.add_argument("--burst", type=int, default=None,
+                      help="Maximum messages sent at once (default: rate)")
+  parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                      help="Retries for sends rejected with 429 or 5xx")
+  args = parser.parse_args()
+
+  with open(args.notification) as f:
+    notification = json.load(f)
+
+  service = build_service(args.endpoint)
+  batch_uri = None
+  if args.endpoint:
+    batch_uri = args.endpoint.rstrip("/") + "/batch/gmail/v1"
+  dispatcher = GmailBatchDispatcher(
+      service, batch_uri=batch_uri, batch_size=args.batch_size, rate=args.rate,
+      burst=args.burst, max_retries=args.max_retries,
+  )
+  template = render_template(notification["products"], args.sender)
+  stats = dispatcher.dispatch(
+      template, args.frontend_base_url, notification["recipients"]
+  )
+  print(
+      f'Sent {stats["sent"]} messages ({stats["failed"]} failed, '
+      f'{stats["retried"]} retries) in '
+      f'{stats["seconds"]}s: {stats["messages_per_sec"]} messages/sec'
+  )
+  for failure in stats["failures"]:
+    print(f'  {failure["email"]}: {failure["error"]}')
+
+
+if __name__ == "__main__":
+  main()
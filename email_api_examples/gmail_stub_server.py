@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Gmail API send and batch endpoints.
+
+Accepts `POST /gmail/v1/users/me/messages/send` and multipart
+`POST /batch/gmail/v1` requests, answers every send with a fake message id,
+and never delivers anything. Used to exercise batch_send_messages.py without
+credentials or quota:
+
+  python gmail_stub_server.py --port 8089 --latency 0.05
+"""
+
+import argparse
+import email
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEND_PATH = "/gmail/v1/users/me/messages/send"
+BATCH_PATH = "/batch/gmail/v1"
+
+
+def _send_result(fail_rate):
+  if random.random() < fail_rate:
+    return 429, {"error": {"code": 429, "message": "Rate limit exceeded"}}
+  message_id = uuid.uuid4().hex[:16]
+  return 200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+
+class GmailStubHandler(BaseHTTPRequestHandler):
+  latency = 0.0
+  fail_rate = 0.0
+
+  def _read_body(self):
+    return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+  def _reply(self, status, content_type, body):
+    self.send_response(status)
+    self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_POST(self):
+    body = self._read_body()
+    time.sleep(self.latency)
+    if self.path.startswith(SEND_PATH):
+      status, result = _send_result(self.fail_rate)
+      self._reply(status, "application/json", json.dumps(result).encode())
+    elif self.path.startswith(BATCH_PATH):
+      self._handle_batch(body)
+    else:
+      self._reply(404, "application/json", b'{"error": "not found"}')
+
+  def _handle_batch(self, body):
+    envelope = email.message_from_bytes(
+        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+    )
+    boundary = f"batch_{uuid.uuid4().hex}"
+    parts = []
+    for part in envelope.get_payload():
+      content_id = part["Content-ID"].strip("<>")
+      status, result = _send_result(self.fail_rate)
+      reason = "OK" if status == 200 else "Too Many Requests"
+      parts.append(
+          f"--{boundary}\r\n"
+          "Content-Type: application/http\r\n"
+          f"Content-ID: <response-{content_id}>\r\n\r\n"
+          f"HTTP/1.1 {status} {reason}\r\n"
+          "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+          f"{json.dumps(result)}\r\n"
+      )
+    parts.append(f"--{boundary}--\r\n")
+    self._reply(
+        200, f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+    )
+
+  def log_message(self, format, *args):
+    pass
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Local Gmail API stub")
+  parser.add_argument("--port", type=int, default=8089)
+  parser.add_argument("--latency", type=float, default=0.0,
+                      help="Seconds to wait before answering each HTTP request")
+  parser.add_argument("--fail-rate", type=float, default=0.0,
+                      help="Fraction of sends answered with 429")
+  args = parser.parse_args()
+
+  GmailStubHandler.latency = args.latency
+  GmailStubHandler.fail_rate = args.fail_rate
+  server = ThreadingHTTPServer(("127.0.0.1", args.port), GmailStubHandler)
+  print(f"Gmail stub listening on http://127.0.0.1:{args.port}/")
+  server.serve_forever()
+
+
+if __name__ == "__main__":
+  main()
@@ -10,19 +10,40 @@ from bs4 import BeautifulSoup
 import logging
 from config import *
 from selenium.common.exceptions import ElementNotInteractableException, TimeoutException
-import psutil
+from failure_artifacts import FailureArtifactStore
+from pincode_health import UNSERVICEABLE, TRANSIENT, SITE_CHANGED
+from stock_payload import build_stock_changes_payload
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Messages the location widget shows when it has no entry for a pincode
+UNSERVICEABLE_MESSAGES = (
+    'not serviceable', 'not deliverable', 'no results', 'no pincode found',
+    'do not deliver', "don't deliver", 'not available in your area',
+)
+
+def merge_products(*product_lists):
+    """Merge product lists from several category pages, keeping the first copy of each productId"""
+    merged = {}
+    for products in product_lists:
+        for product in products:
+            merged.setdefault(product['productId'], product)
+    return list(merged.values())
+
 class AmulScraper:
-    def __init__(self, test_mode=False, pincode=None):
+    def __init__(self, test_mode=False, pincode=None, artifacts=None):
         from config import PIN_CODE
         self.test_mode = test_mode
         self.driver = None
         self.session = requests.Session()
         self.pincode = pincode if pincode else PIN_CODE
+        # Share one store between scrapers so a single thread writes and prunes the directory
+        self.artifacts = artifacts or FailureArtifactStore()
+        self.stage_timings = {}  # stage -> seconds since enter_pincode started
+        self.last_failure = None  # failure class of the last scrape cycle, see pincode_health
+        self.dropdown_timeout_pincodes = set()  # distinct pincodes whose dropdown timed out since one last worked
         
     def setup_driver(self):
         """Set up Chrome WebDriver with appropriate options"""
@@ -45,11 +66,44 @@ class AmulScraper:
             logger.error(f"Error initializing Chrome WebDriver: {e}")
             raise Exception("Could not initialize Chrome WebDriver. Please ensure Chrome is installed.")
 
+    def browser_state(self):
+        """Return the browser's cookies (including the selected pincode) and user agent for plain HTTP requests"""
+        cookies = {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+        user_agent = self.driver.execute_script("return navigator.userAgent")
+        return {'cookies': cookies, 'headers': {'User-Agent': user_agent}}
+
+    def _mark_stage(self, stage, started):
+        self.stage_timings[stage] = round(time.perf_counter() - started, 3)
+
+    def _capture_failure(self, stage, error):
+        """Save a failure snapshot in the background and log only its reference ID"""
+        artifact_id = self.artifacts.capture(
+            self.driver, stage, pincode=self.pincode, error=error,
+            stage_timings=dict(self.stage_timings)
+        )
+        logger.error(f"Failure snapshot saved as {artifact_id} (stage: {stage})")
+
+    def _unserviceable_notice(self):
+        """Return the site's "not serviceable" / "no results" message if one is shown, else None"""
+        try:
+            containers = self.driver.find_elements(By.CSS_SELECTOR, "#locationWidgetModal") or \
+                self.driver.find_elements(By.TAG_NAME, "body")
+            for container in containers:
+                for line in container.text.splitlines():
+                    if any(phrase in line.lower() for phrase in UNSERVICEABLE_MESSAGES):
+                        return line.strip()
+        except Exception as e:
+            logger.warning(f"Could not check for a not-serviceable message: {e}")
+        return None
+
     def enter_pincode(self):
         """Enter PIN code on the Amul website and select from dropdown"""
+        started = time.perf_counter()
+        self.stage_timings = {}
         try:
             if not self.driver:
                 logger.error("WebDriver is not initialized")
+                self.last_failure = TRANSIENT
                 return False
             
             # Find the PIN input field robustly
@@ -79,6 +133,7 @@ class AmulScraper:
                         time.sleep(1)
                     except Exception as e:
                         logger.error(f"Could not find or click location button: {e}")
+                        self.last_failure = SITE_CHANGED
                         return False
                 # Now wait for the input to become visible
                 try:
@@ -87,10 +142,13 @@ class AmulScraper:
                     )
                 except Exception as e:
                     logger.error(f"Could not find PIN input after opening modal: {e}")
+                    self.last_failure = SITE_CHANGED
                     return False
+            self._mark_stage('find_input', started)
             pin_input.clear()
             pin_input.send_keys(self.pincode)
             time.sleep(1.5)  # Give time for dropdown to appear
+            self._mark_stage('type_pincode', started)
 
             # Wait for the dropdown item to appear (try both li and div)
             dropdown_item = None
@@ -98,6 +156,8 @@ class AmulScraper:
                 dropdown_item = WebDriverWait(self.driver, 15).until(
                     EC.presence_of_element_located((By.XPATH, f"//*[text()='{self.pincode}']"))
                 )
+                self._mark_stage('dropdown', started)
+                self.dropdown_timeout_pincodes.clear()
                 logger.info("Dropdown item found, attempting to click...")
                 # Try normal click
                 try:
@@ -134,12 +194,35 @@ class AmulScraper:
                                 logger.info("Clickable wait + click succeeded")
                             except Exception as e4:
                                 logger.error(f"All click methods failed. Last error: {e4}")
+                                self.last_failure = TRANSIENT
                                 return False
+            except TimeoutException as e:
+                # A slow page or a changed layout times out just like an unknown
+                # pincode, so only trust the site's own "no results" message
+                notice = self._unserviceable_notice()
+                if notice:
+                    logger.error(f"Pincode {self.pincode} is not serviceable: {notice!r}")
+                    self.dropdown_timeout_pincodes.clear()
+                    self.last_failure = UNSERVICEABLE
+                    return False
+                # Retries of one slow pincode count once; only many different
+                # pincodes timing out in a row points at the page itself
+                self.dropdown_timeout_pincodes.add(str(self.pincode))
+                if len(self.dropdown_timeout_pincodes) >= DROPDOWN_TIMEOUT_PINCODES:
+                    logger.error(f"Dropdown not found for {len(self.dropdown_timeout_pincodes)} different pincodes in a row, site layout may have changed: {e}")
+                    self.last_failure = SITE_CHANGED
+                else:
+                    logger.error(f"Dropdown with PIN code not found: {e}")
+                    self.last_failure = TRANSIENT
+                self._capture_failure('dropdown', e)
+                return False
             except Exception as e:
                 logger.error(f"Dropdown with PIN code not found: {e}")
+                self.last_failure = TRANSIENT
                 if self.driver:
-                    logger.error(self.driver.page_source)  # Log page source for debugging
+                    self._capture_failure('dropdown', e)
                 return False
+            self._mark_stage('select_pincode', started)
 
             # Wait for the modal to disappear (input to become stale or invisible)
             try:
@@ -149,6 +232,7 @@ class AmulScraper:
                 logger.info("PIN modal closed.")
             except Exception:
                 logger.warning("PIN modal did not close after selection.")
+            self._mark_stage('modal_close', started)
 
             # Wait for products to load
             time.sleep(5)
@@ -156,8 +240,9 @@ class AmulScraper:
 
         except Exception as e:
             logger.error(f"Error entering PIN code: {e}")
+            self.last_failure = TRANSIENT
             if self.driver:
-                logger.error(self.driver.page_source)  # Log page source for debugging
+                self._capture_failure('enter_pincode', e)
             return False
             
     def scrape_products(self):
@@ -291,6 +376,38 @@ class AmulScraper:
             logger.error(f"Error scraping products: {e}")
             return []
             
+    def scrape_additional_categories(self):
+        """Scrape the remaining category pages in parallel tabs of the current session.
+
+        The pincode is already selected, so each extra category costs one page
+        load. ``window.open`` returns immediately, so all tabs load concurrently.
+        """
+        urls = [url for url in AMUL_CATEGORY_URLS if url != AMUL_URL]
+        if not urls:
+            return []
+        main_handle = self.driver.current_window_handle
+        existing_handles = set(self.driver.window_handles)
+        for url in urls:
+            self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        new_handles = [h for h in self.driver.window_handles if h not in existing_handles]
+
+        products = []
+        try:
+            for handle in new_handles:
+                self.driver.switch_to.window(handle)
+                category_products = self.scrape_products()
+                logger.info(f"Scraped {len(category_products)} products from {self.driver.current_url}")
+                products.extend(category_products)
+        finally:
+            for handle in new_handles:
+                try:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                except Exception as e:
+                    logger.warning(f"Could not close category tab: {e}")
+            self.driver.switch_to.window(main_handle)
+        return products
+
     def send_stock_changes_to_backend(self, products):
         """Send scraped data to backend for processing, with retry logic."""
         max_retries = 3
@@ -299,12 +416,7 @@ class AmulScraper:
             try:
                 response = self.session.post(
                     f"{BACKEND_API_BASE}/stock-changes",
-                    json={
-                        'products': products,
-                        'timestamp': time.time(),
-                        'scraper_id': 'amul-scraper-1',
-                        'pincode': self.pincode
-                    },
+                    json=build_stock_changes_payload(products, self.pincode),
                     headers={'Content-Type': 'application/json'}
                 )
 
@@ -326,9 +438,11 @@ class AmulScraper:
             
     def run_scrape_cycle(self):
         """Run one complete scraping cycle"""
+        self.last_failure = None
         try:
             if not self.driver:
                 logger.error("WebDriver is not initialized.")
+                self.last_failure = TRANSIENT
                 return
             logger.info("Starting scraping cycle")
             
@@ -359,8 +473,18 @@ class AmulScraper:
             # Scrape products
             logger.info(f"Starting to scrape products for pincode {self.pincode}...")
             products = self.scrape_products()
+
+            # Other configured categories reuse the selected pincode
+            if len(AMUL_CATEGORY_URLS) > 1:
+                try:
+                    products = merge_products(products, self.scrape_additional_categories())
+                except Exception as e:
+                    logger.error(f"Error scraping additional categories: {e}")
+
             if not products:
+                # The pincode was accepted, so a missing grid points at a layout change
                 logger.warning("No products found")
+                self.last_failure = SITE_CHANGED
                 return []
 
             # === RESTOCK SIMULATION FOR TESTING ===
@@ -383,6 +507,7 @@ class AmulScraper:
 
         except Exception as e:
             logger.error(f"Error in scraping cycle: {e}")
+            self.last_failure = TRANSIENT
             import traceback
             logger.error(f"Full traceback: {traceback.format_exc()}")
             return []
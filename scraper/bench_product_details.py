@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the product detail crawler against a local fixture server.
+
+Serves synthetic product pages with ETag / Last-Modified headers and simulated
+latency, then measures a cold pass (every page is a 200) and a warm pass
+(every page is a 304) for several concurrency levels.
+
+    python bench_product_details.py --pages 60 --latency 0.1 --concurrency 1 4 8 16
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from product_details import ProductDetailCrawler
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def fixture_page(index):
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": f"Amul High Protein Product {index}",
+        "offers": {"@type": "Offer", "price": str(100 + index), "availability": "https://schema.org/InStock"},
+        "hasVariant": [
+            {"name": f"Pack of {n}", "sku": f"SKU-{index}-{n}",
+             "offers": {"price": str((100 + index) * n), "availability": "https://schema.org/OutOfStock"}}
+            for n in (6, 30)
+        ],
+    }
+    return (
+        f"<html><head><script type=\"application/ld+json\">{json.dumps(data)}</script></head>"
+        f"<body><h1>Amul High Protein Product {index} | 200 g</h1>{'<p>filler</p>' * 500}</body></html>"
+    ).encode()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    pages = {}
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_pass(crawler, products):
+    started = time.perf_counter()
+    crawler.enrich([dict(product) for product in products], pincode=110036)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ProductDetailCrawler against a local fixture server')
+    parser.add_argument('--pages', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.1, help='Simulated server latency per request (seconds)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    FixtureHandler.latency = args.latency
+    FixtureHandler.pages = {f"/en/product/p{i}": fixture_page(i) for i in range(args.pages)}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    products = [{'productId': f"p{i}", 'productPageUrl': f"{base}/en/product/p{i}"} for i in range(args.pages)]
+
+    print(f"{args.pages} pages, {args.latency * 1000:.0f} ms simulated latency")
+    print(f"{'workers':>8} {'cold s':>8} {'cold p/s':>9} {'warm s':>8} {'warm p/s':>9} {'304s':>5}")
+    try:
+        for workers in args.concurrency:
+            crawler = ProductDetailCrawler(requests.Session(), max_workers=workers)
+            cold = run_pass(crawler, products)
+            warm = run_pass(crawler, products)
+            print(
+                f"{workers:>8} {cold:>8.2f} {args.pages / cold:>9.1f} "
+                f"{warm:>8.2f} {args.pages / warm:>9.1f} {crawler.stats['not_modified']:>5}"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Check that unserviceable pincodes stay in the negative cache across cycles.
+
+Drives the server's scrape job handler with a stub scraper (no Chrome needed)
+over a mix of serviceable and unserviceable pincodes for several cycles, with
+the negative cache's re-check interval longer than the run, and verifies:
+
+  * unserviceable pincodes are scraped once, then skipped on later cycles
+  * serviceable pincodes are scraped every cycle
+  * unserviceable results never count against the site circuit breaker
+
+    python check_pincode_health.py --serviceable 4 --unserviceable 1 2 3 --cycles 3
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+import fastapi_server
+from pincode_health import NegativeCache, UNSERVICEABLE
+from stock_history import StockHistory
+
+
+class StubScraper:
+    """Stands in for AmulScraper: unserviceable pincodes report UNSERVICEABLE"""
+
+    def __init__(self, unserviceable):
+        self.unserviceable = set(unserviceable)
+        self.pincode = None
+        self.last_failure = None
+        self.scraped = []
+
+    def run_scrape_cycle(self):
+        self.scraped.append(self.pincode)
+        if self.pincode in self.unserviceable:
+            self.last_failure = UNSERVICEABLE
+            return None
+        self.last_failure = None
+        return [{'productId': f'P{self.pincode}', 'name': 'Stub product', 'sold_out': False}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check negative cache behaviour over several scrape cycles')
+    parser.add_argument('--serviceable', type=int, nargs='+', default=[4])
+    parser.add_argument('--unserviceable', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--cycles', type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    pincodes = args.serviceable + args.unserviceable
+    scraper = StubScraper(args.unserviceable)
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        fastapi_server.negative_cache = NegativeCache(path=os.path.join(tmp, 'negative_cache.json'))
+        fastapi_server.history = StockHistory(os.path.join(tmp, 'history.db'))
+        for cycle in range(1, args.cycles + 1):
+            scraper.scraped = []
+            for index, pincode in enumerate(pincodes):
+                fastapi_server._run_scrape_job(scraper, f'cycle{cycle}-{index}', pincode)
+            cached = sorted(int(pin) for pin in fastapi_server.negative_cache.snapshot())
+            breaker = fastapi_server.site_breaker.snapshot()
+            print(f"cycle {cycle}: scraped {scraper.scraped}, cached {cached}, site breaker {breaker}")
+
+            expected = pincodes if cycle == 1 else args.serviceable
+            if scraper.scraped != expected:
+                print(f"  FAIL: expected to scrape {expected}")
+                failed = True
+            if cached != sorted(args.unserviceable):
+                print(f"  FAIL: expected cache {sorted(args.unserviceable)}")
+                failed = True
+            if breaker['state'] != 'closed' or breaker['consecutive_failures']:
+                print("  FAIL: unserviceable pincodes counted against the site breaker")
+                failed = True
+        fastapi_server.history.close()
+    print('FAIL' if failed else 'OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Minimal thread-safe circuit breaker.
+
+After ``failure_threshold`` consecutive failures the breaker opens and
+``allow()`` returns False for ``reset_timeout`` seconds. After that calls are
+let through again (half-open): the next success closes the breaker and the
+next failure re-opens it for another ``reset_timeout``.
+"""
+
+import logging
+import time
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_timeout=300):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = Lock()
+
+    def allow(self):
+        """Return True if a call may proceed"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                logger.info(f"Circuit '{self.name}' half-open, allowing trial calls")
+            return self.state == HALF_OPEN
+
+    def is_open(self):
+        """True while the breaker is open and its cooldown hasn't elapsed"""
+        with self._lock:
+            return self.state == OPEN and time.time() - self.opened_at < self.reset_timeout
+
+    def seconds_until_retry(self):
+        with self._lock:
+            if self.state != OPEN:
+                return 0
+            return max(0.0, self.reset_timeout - (time.time() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after {self.failures} consecutive failures; "
+                        f"pausing for {self.reset_timeout}s"
+                    )
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
@@ -3,16 +3,76 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_int(name, default):
+    """Read an integer setting; unset or blank values (as in env_example.txt) use the default"""
+    value = os.getenv(name, '').strip()
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    """Read a float setting; unset or blank values use the default"""
+    value = os.getenv(name, '').strip()
+    return float(value) if value else default
+
 # Backend API configuration
 # BACKEND_API_BASE = os.getenv('BACKEND_API_BASE', 'http://localhost:8000/api')
 BACKEND_API_BASE = os.getenv('BACKEND_API_BASE', 'https://amul-protein-products-notifier-backend-5lyo.onrender.com/api')
 
 # Amul website configuration
-AMUL_URL = "https://shop.amul.com/en/browse/protein"
+# Comma-separated category pages scraped in one session per pincode; the first
+# one is where the pincode gets selected
+AMUL_CATEGORY_URLS = [
+    url.strip() for url in os.getenv('AMUL_CATEGORY_URLS', '').split(',') if url.strip()
+] or ['https://shop.amul.com/en/browse/protein']
+AMUL_URL = AMUL_CATEGORY_URLS[0]
 PIN_CODE = os.getenv('PIN_CODE', "122003")  # Default, can be overridden at runtime
 
 # Scraping configuration
 HEADLESS_MODE = os.getenv('HEADLESS_MODE', 'false').lower() == 'true'
+# Number of Chrome drivers (and scrape workers) launched at startup
+SCRAPER_DRIVERS = _env_int('SCRAPER_DRIVERS', 1)
+DRIVER_LAUNCH_RETRIES = _env_int('DRIVER_LAUNCH_RETRIES', 2)  # extra attempts per driver at startup
+
+# Product detail pages (price, pack size, variants)
+FETCH_PRODUCT_DETAILS = os.getenv('FETCH_PRODUCT_DETAILS', 'false').lower() == 'true'
+DETAIL_FETCH_CONCURRENCY = _env_int('DETAIL_FETCH_CONCURRENCY', 8)
+DETAIL_FETCH_TIMEOUT = _env_float('DETAIL_FETCH_TIMEOUT', 10)  # seconds
+DETAIL_QUEUE_SIZE = _env_int('DETAIL_QUEUE_SIZE', 100)  # oldest snapshot is dropped when full
 
 # MongoDB configuration
-MONGO_URI = os.getenv('MONGO_URI', '')
\ No newline at end of file
+MONGO_URI = os.getenv('MONGO_URI', '')
+
+# Stock history and restock-aware scheduling
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH') or 'stock_history.db'
+HISTORY_LOOKBACK_DAYS = _env_int('HISTORY_LOOKBACK_DAYS', 28)
+HISTORY_TZ_OFFSET_MINUTES = _env_int('HISTORY_TZ_OFFSET_MINUTES', 330)  # IST
+ADAPTIVE_SCHEDULING = os.getenv('ADAPTIVE_SCHEDULING', 'false').lower() == 'true'
+SCRAPE_BASE_INTERVAL = _env_int('SCRAPE_BASE_INTERVAL', 900)  # seconds
+
+# Restock event stream
+EVENT_BUFFER_SIZE = _env_int('EVENT_BUFFER_SIZE', 100)  # events buffered per stream subscriber
+
+
+# Failure snapshots (HTML + screenshot), kept as a bounded ring buffer on disk
+ARTIFACTS_DIR = os.getenv('ARTIFACTS_DIR') or 'failure_artifacts'
+ARTIFACTS_MAX_COUNT = _env_int('ARTIFACTS_MAX_COUNT', 20)
+ARTIFACTS_MAX_BYTES = _env_int('ARTIFACTS_MAX_BYTES', 50 * 1024 * 1024)
+
+# Pincode failure handling
+NEGATIVE_CACHE_PATH = os.getenv('NEGATIVE_CACHE_PATH') or 'negative_cache.json'
+NEGATIVE_CACHE_BASE_INTERVAL = _env_int('NEGATIVE_CACHE_BASE_INTERVAL', 3600)  # seconds, doubles per failure
+NEGATIVE_CACHE_MAX_INTERVAL = _env_int('NEGATIVE_CACHE_MAX_INTERVAL', 7 * 24 * 3600)
+TRANSIENT_RETRIES = _env_int('TRANSIENT_RETRIES', 1)
+TRANSIENT_RETRY_DELAY = _env_float('TRANSIENT_RETRY_DELAY', 2)  # seconds
+SITE_CHANGED_THRESHOLD = _env_int('SITE_CHANGED_THRESHOLD', 3)  # consecutive failures before pausing
+SITE_CHANGED_COOLDOWN = _env_int('SITE_CHANGED_COOLDOWN', 1800)  # seconds
+DROPDOWN_TIMEOUT_PINCODES = _env_int('DROPDOWN_TIMEOUT_PINCODES', 5)  # distinct pincodes timing out before reporting site_changed
+
+# Pipeline between the scrape and backend-send stages
+SCRAPE_QUEUE_SIZE = _env_int('SCRAPE_QUEUE_SIZE', 100)  # new jobs are rejected when full
+BACKEND_QUEUE_SIZE = _env_int('BACKEND_QUEUE_SIZE', 100)  # oldest snapshot is dropped when full
+BACKEND_FAILURE_THRESHOLD = _env_int('BACKEND_FAILURE_THRESHOLD', 3)  # failed sends before pausing
+BACKEND_COOLDOWN = _env_int('BACKEND_COOLDOWN', 120)  # seconds
+BACKEND_TIMEOUT = _env_float('BACKEND_TIMEOUT', 30)  # seconds per request
+JOB_STATUS_LIMIT = _env_int('JOB_STATUS_LIMIT', 10000)  # job statuses kept for /scrape_status
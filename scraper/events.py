@@ -0,0 +1,92 @@
+"""
+In-process broker for restock / sold-out events.
+
+The scrape worker publishes transitions from a plain thread; subscribers are
+async consumers (the SSE endpoint in ``fastapi_server.py``). Each subscriber
+gets its own bounded buffer and publishing never blocks: when a subscriber
+falls behind, its oldest buffered events are dropped so scraping is never
+stalled by a slow client.
+"""
+
+import asyncio
+import logging
+from threading import Lock
+
+from config import EVENT_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single consumer's filtered, bounded view of the event stream"""
+
+    def __init__(self, loop, pincodes=None, product_ids=None, maxsize=100):
+        self.loop = loop
+        self.pincodes = set(pincodes) if pincodes else None
+        self.product_ids = set(product_ids) if product_ids else None
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event):
+        if self.pincodes is not None and event.get('pincode') not in self.pincodes:
+            return False
+        if self.product_ids is not None and event.get('productId') not in self.product_ids:
+            return False
+        return True
+
+    def _offer(self, event):
+        # Runs on the event loop thread
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Wait for the next event, returning None if ``timeout`` expires"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """Fans published events out to all matching subscriptions"""
+
+    def __init__(self, buffer_size=None):
+        self.buffer_size = buffer_size or EVENT_BUFFER_SIZE
+        self._subscriptions = set()
+        self._lock = Lock()
+
+    def subscribe(self, pincodes=None, product_ids=None):
+        """Register a subscriber; must be called from the event loop"""
+        subscription = Subscription(
+            asyncio.get_running_loop(), pincodes, product_ids, self.buffer_size
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+        if subscription.dropped:
+            logger.warning(f"Subscriber dropped {subscription.dropped} events because it fell behind")
+
+    def publish(self, events):
+        """Publish events from any thread without blocking"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for event in events:
+            for subscription in subscriptions:
+                if not subscription.matches(event):
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._offer, event)
+                except RuntimeError:
+                    # Event loop already closed
+                    self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
@@ -0,0 +1,107 @@
+"""
+Bounded on-disk store for scrape failure snapshots.
+
+Instead of dumping ``page_source`` into the log, a failing stage grabs the
+HTML and a screenshot from the driver and hands them to this store. The
+compression and disk writes run on a background thread and only a short
+reference ID is logged. Old snapshots are pruned so the directory never holds
+more than ``max_count`` files or ``max_bytes`` bytes.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ARTIFACTS_DIR, ARTIFACTS_MAX_COUNT, ARTIFACTS_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class FailureArtifactStore:
+    """Ring buffer of compressed failure snapshots"""
+
+    def __init__(self, directory=None, max_count=None, max_bytes=None):
+        self.directory = directory or ARTIFACTS_DIR
+        self.max_count = max_count or ARTIFACTS_MAX_COUNT
+        self.max_bytes = max_bytes or ARTIFACTS_MAX_BYTES
+        # A single writer thread keeps writes ordered and pruning race-free,
+        # as long as one store is shared by every scraper writing to the directory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+
+    def capture(self, driver, stage, pincode=None, error=None, stage_timings=None):
+        """Snapshot the driver state and return the artifact reference ID.
+
+        Only the driver calls happen on the calling thread, since the page
+        may change once the scrape moves on; everything else is deferred.
+        """
+        artifact_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        html = None
+        screenshot = None
+        url = None
+        try:
+            url = driver.current_url
+        except Exception as e:
+            logger.warning(f"Could not read current URL for artifact {artifact_id}: {e}")
+        try:
+            html = driver.page_source
+        except Exception as e:
+            logger.warning(f"Could not read page source for artifact {artifact_id}: {e}")
+        try:
+            screenshot = driver.get_screenshot_as_png()
+        except Exception as e:
+            logger.warning(f"Could not take screenshot for artifact {artifact_id}: {e}")
+        metadata = {
+            'id': artifact_id,
+            'stage': stage,
+            'pincode': pincode,
+            'error': str(error) if error else None,
+            'url': url,
+            'captured_at': time.time(),
+            'stage_timings': stage_timings or {},
+        }
+        self._executor.submit(self._write, artifact_id, html, screenshot, metadata)
+        return artifact_id
+
+    def _write(self, artifact_id, html, screenshot, metadata):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{artifact_id}.zip")
+            with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('metadata.json', json.dumps(metadata, indent=2))
+                if html is not None:
+                    archive.writestr('page.html', html)
+                if screenshot is not None:
+                    # PNG data is already compressed
+                    archive.writestr('screenshot.png', screenshot, compress_type=zipfile.ZIP_STORED)
+            self._prune()
+        except Exception as e:
+            logger.error(f"Failed to write failure artifact {artifact_id}: {e}")
+
+    def _prune(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.zip'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # removed by someone else meanwhile
+            entries.append((stat.st_mtime, name, path, stat.st_size))
+        entries.sort()
+        total = sum(entry[3] for entry in entries)
+        while entries and (len(entries) > self.max_count or total > self.max_bytes):
+            _, _, path, size = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def flush(self, timeout=None):
+        """Wait for pending snapshots to be written"""
+        self._executor.submit(lambda: None).result(timeout)
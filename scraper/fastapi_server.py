@@ -1,25 +1,60 @@
-from fastapi import FastAPI
-from amul_scraper import AmulScraper
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
 import logging
 from contextlib import asynccontextmanager
-from threading import Thread, Lock
-from queue import Queue
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import time
+import json
 import requests
-from config import BACKEND_API_BASE
-import psutil
+from config import (
+    BACKEND_API_BASE, ADAPTIVE_SCHEDULING, AMUL_URL, SCRAPER_DRIVERS,
+    TRANSIENT_RETRIES, TRANSIENT_RETRY_DELAY, SITE_CHANGED_THRESHOLD, SITE_CHANGED_COOLDOWN,
+    SCRAPE_QUEUE_SIZE, BACKEND_QUEUE_SIZE, BACKEND_FAILURE_THRESHOLD, BACKEND_COOLDOWN,
+    BACKEND_TIMEOUT, JOB_STATUS_LIMIT, DRIVER_LAUNCH_RETRIES, FETCH_PRODUCT_DETAILS, DETAIL_QUEUE_SIZE,
+)
+from stock_history import StockHistory, RestockScheduler
+from events import EventBroker
+from circuit_breaker import CircuitBreaker
+from stock_payload import build_stock_changes_payload
+from pincode_health import NegativeCache, UNSERVICEABLE, TRANSIENT, SITE_CHANGED
+from failure_artifacts import FailureArtifactStore
+from pipeline import BoundedDict, CoalescingQueue, COALESCED, DROPPED_OLDEST, REJECTED, REJECT, DROP_OLDEST
 
-# Queues for staging jobs
-scrape_queue = Queue()
-backend_queue = Queue()
-queue_lock = Lock()
-job_status = {}  # job_id -> status
+# Selenium, BeautifulSoup and psutil are imported lazily (amul_scraper is only
+# imported by the warm-up thread) so the server can answer /ping as soon as
+# the process starts on a cold host
+_module_loaded_at = time.time()
 
-scraper = None
+# Bounded queues for staging jobs, keyed by pincode: a newer job or snapshot
+# for a pincode replaces the pending one instead of queuing behind it
+scrape_queue = CoalescingQueue('scrape', SCRAPE_QUEUE_SIZE, overflow=REJECT)
+backend_queue = CoalescingQueue('backend', BACKEND_QUEUE_SIZE, overflow=DROP_OLDEST)
+# Product page fetching runs last, after events and the backend send are queued
+detail_queue = CoalescingQueue('details', DETAIL_QUEUE_SIZE, overflow=DROP_OLDEST)
+job_status = BoundedDict(JOB_STATUS_LIMIT)  # job_id -> status, oldest evicted first
+# Opens when the backend keeps failing; scraping pauses while it is open
+backend_breaker = CircuitBreaker('backend', BACKEND_FAILURE_THRESHOLD, BACKEND_COOLDOWN)
+backend_session = requests.Session()
+pipeline_stats = {'scrape_paused_seconds': 0.0}
+pipeline_stats_lock = Lock()
+
+scrapers = []  # warmed-up AmulScraper instances, one per scrape worker
+history = None
+startup_metrics = {}
+negative_cache = NegativeCache()
+# Opens when the site layout looks changed for several pincodes in a row
+site_breaker = CircuitBreaker('site', SITE_CHANGED_THRESHOLD, SITE_CHANGED_COOLDOWN)
+event_broker = EventBroker()
+artifact_store = FailureArtifactStore()  # shared by all scrapers
+
+FALLBACK_PINCODES = [110036, 122003, 560001, 400001]
 
 # CPU logging function (optional)
 def log_cpu_usage():
+    import psutil
     p = psutil.Process()
     while True:
         cpu = p.cpu_percent(interval=1)
@@ -28,58 +63,227 @@ def log_cpu_usage():
 # Lifespan to initialize scraper and worker threads
 @asynccontextmanager
 async def lifespan(app):
-    global scraper
+    global history
     logging.basicConfig(level=logging.INFO)
-    scraper = AmulScraper()
-    scraper.setup_driver()
-    logging.info("AmulScraper and Chrome driver initialized.")
+    history = StockHistory()
+
+    # Launch Chrome drivers in the background so the app starts serving
+    # immediately; scrape jobs queue up until a driver is ready
+    Thread(target=warm_up, daemon=True).start()
 
     # Start worker threads
-    Thread(target=scrape_worker, daemon=True).start()
     Thread(target=backend_worker, daemon=True).start()
+    if FETCH_PRODUCT_DETAILS:
+        Thread(target=detail_worker, daemon=True).start()
+    if ADAPTIVE_SCHEDULING:
+        Thread(target=schedule_worker, daemon=True).start()
     # Thread(target=log_cpu_usage, daemon=True).start()
 
+    startup_metrics['app_ready_seconds'] = round(time.time() - _module_loaded_at, 3)
+    logging.info(f"App ready in {startup_metrics['app_ready_seconds']}s")
+
     try:
         yield
     finally:
         # Signal shutdown
-        scrape_queue.put(None)
-        backend_queue.put(None)
-        if scraper and scraper.driver:
-            scraper.driver.quit()
+        scrape_queue.close()
+        backend_queue.close()
+        detail_queue.close()
+        for scraper in scrapers:
+            if scraper.driver:
+                scraper.driver.quit()
+        if history:
+            history.close()
         logging.info("Shutdown complete.")
 
 app = FastAPI(lifespan=lifespan)
 
+def _launch_scraper(index):
+    """Start one Chrome driver, retrying on failure, and pre-navigate it to the product page"""
+    from amul_scraper import AmulScraper
+    for attempt in range(DRIVER_LAUNCH_RETRIES + 1):
+        started = time.time()
+        scraper = AmulScraper(artifacts=artifact_store)
+        try:
+            scraper.setup_driver()
+            break
+        except Exception as e:
+            logging.error(f"Driver {index} launch attempt {attempt + 1} failed: {e}")
+            # Don't leave an orphaned Chrome process behind
+            if scraper.driver:
+                try:
+                    scraper.driver.quit()
+                except Exception:
+                    pass
+            if attempt == DRIVER_LAUNCH_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+    # Pre-navigation is only an optimisation; run_scrape_cycle navigates again if needed
+    try:
+        scraper.driver.get(AMUL_URL)
+    except Exception as e:
+        logging.warning(f"Driver {index} could not pre-navigate to {AMUL_URL}: {e}")
+    logging.info(f"Driver {index} ready in {time.time() - started:.2f}s")
+    return scraper
+
+# Warm-up: launch all drivers concurrently and start a scrape worker for each
+def warm_up():
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=SCRAPER_DRIVERS) as executor:
+        futures = [executor.submit(_launch_scraper, i) for i in range(SCRAPER_DRIVERS)]
+        for future in futures:
+            try:
+                scraper = future.result()
+            except Exception as e:
+                logging.error(f"Driver warm-up failed: {e}")
+                continue
+            scrapers.append(scraper)
+            Thread(target=scrape_worker, args=(scraper,), daemon=True).start()
+    startup_metrics['warm_up_seconds'] = round(time.time() - started, 3)
+    startup_metrics['drivers_ready'] = len(scrapers)
+    if not scrapers:
+        logging.critical("No Chrome driver could be started; /scrape will return 503")
+    logging.info(f"{len(scrapers)}/{SCRAPER_DRIVERS} drivers warmed up in {startup_metrics['warm_up_seconds']}s")
+
 # Worker to process scraping jobs
-def scrape_worker():
+def scrape_worker(scraper):
     while True:
-        job = scrape_queue.get()
-        if job is None:
+        # Wait before taking a job, so jobs stay in the queue (and can still
+        # be coalesced) while the backend is down
+        _wait_for_backend()
+        entry = scrape_queue.get()
+        if entry is None:
             break
-        job_id, pincode = job
-        job_status[job_id] = "in_progress_scrape"
+        pincode, job_id = entry
         try:
-            scraper.pincode = pincode
-            products = scraper.run_scrape_cycle()
-            job_status[job_id] = "scraped"
-            # Queue for backend sending
-            backend_queue.put((job_id, pincode, products))
+            _run_scrape_job(scraper, job_id, pincode)
         except Exception as e:
             job_status[job_id] = f"failed_scrape: {e}"
-        scrape_queue.task_done()
+
+def _wait_for_backend():
+    """Backpressure: hold scraping while the backend circuit is open"""
+    if not backend_breaker.is_open():
+        return
+    paused_at = time.time()
+    logging.warning("Backend circuit open, pausing scraping")
+    while backend_breaker.is_open():
+        time.sleep(min(5, max(0.5, backend_breaker.seconds_until_retry())))
+    with pipeline_stats_lock:
+        pipeline_stats['scrape_paused_seconds'] += time.time() - paused_at
+    logging.info(f"Resuming scraping after {time.time() - paused_at:.0f}s pause")
+
+def _run_scrape_job(scraper, job_id, pincode):
+    if negative_cache.should_skip(pincode):
+        job_status[job_id] = "skipped_unserviceable"
+        return
+    if not site_breaker.allow():
+        job_status[job_id] = "skipped_circuit_open"
+        return
+    job_status[job_id] = "in_progress_scrape"
+    scraper.pincode = pincode
+    for attempt in range(TRANSIENT_RETRIES + 1):
+        products = scraper.run_scrape_cycle()
+        if scraper.last_failure != TRANSIENT or attempt == TRANSIENT_RETRIES:
+            break
+        logging.warning(f"Transient failure for pincode {pincode}, retrying (attempt {attempt + 2})")
+        time.sleep(TRANSIENT_RETRY_DELAY)
+
+    failure = scraper.last_failure
+    if failure == UNSERVICEABLE:
+        # Only set when the site itself said so; this says nothing about the
+        # site's health either way, so the site breaker is left alone
+        negative_cache.record_unserviceable(pincode)
+        job_status[job_id] = "unserviceable"
+        return
+    if failure:
+        if failure == SITE_CHANGED:
+            site_breaker.record_failure()
+        job_status[job_id] = f"failed_scrape: {failure}"
+        return
+    negative_cache.record_success(pincode)
+    site_breaker.record_success()
+    job_status[job_id] = "scraped"
+    if 'first_scrape_seconds' not in startup_metrics:
+        startup_metrics['first_scrape_seconds'] = round(time.time() - _module_loaded_at, 3)
+        logging.info(f"First scrape finished {startup_metrics['first_scrape_seconds']}s after startup")
+    # Push restock / sold-out transitions to stream subscribers
+    # before the slower backend hop
+    transitions = history.record_scrape(pincode, products)
+    if transitions:
+        event_broker.publish(transitions)
+    # Queue for backend sending
+    outcome, displaced = backend_queue.put(pincode, (job_id, products))
+    if displaced:
+        job_status[displaced[0]] = "superseded" if outcome == COALESCED else "dropped_queue_full"
+    # Product pages are fetched over plain HTTP by the detail worker, so read
+    # the browser's pincode cookies here while this thread owns the driver
+    if FETCH_PRODUCT_DETAILS:
+        try:
+            detail_queue.put(pincode, ([dict(product) for product in products], scraper.browser_state()))
+        except Exception as e:
+            logging.error(f"Could not queue product details for pincode {pincode}: {e}")
 
 # Worker to send scraped data to backend
 def backend_worker():
     while True:
-        job = backend_queue.get()
-        if job is None:
+        entry = backend_queue.get()
+        if entry is None:
             break
-        job_id, pincode, products = job
+        pincode, (job_id, products) = entry
+        if not backend_breaker.allow():
+            # Wait for the breaker to half-open, then retry this snapshot
+            # unless a newer one for the same pincode arrived meanwhile
+            job_status[job_id] = "waiting_backend"
+            time.sleep(max(0.5, backend_breaker.seconds_until_retry()))
+            outcome = backend_queue.requeue(pincode, (job_id, products))
+            if outcome == COALESCED:
+                job_status[job_id] = "superseded"
+            elif outcome == DROPPED_OLDEST:
+                job_status[job_id] = "dropped_queue_full"
+            continue
         job_status[job_id] = "in_progress_send"
         success = _send_to_backend(pincode, products)
+        if success:
+            backend_breaker.record_success()
+        else:
+            backend_breaker.record_failure()
         job_status[job_id] = "completed" if success else "failed_send"
-        backend_queue.task_done()
+
+# Worker to fetch product pages for price, pack size and variants. The backend's
+# /stock-changes only reads the stock fields, so the results are stored locally
+def detail_worker():
+    from product_details import ProductDetailCrawler
+    crawler = ProductDetailCrawler(requests.Session())
+    while True:
+        entry = detail_queue.get()
+        if entry is None:
+            break
+        pincode, (products, browser_state) = entry
+        try:
+            crawler.enrich(products, pincode=pincode, **browser_state)
+            history.record_details(pincode, products)
+        except Exception as e:
+            logging.error(f"Error fetching product details for pincode {pincode}: {e}")
+
+# Worker that enqueues pincodes on a restock-aware schedule
+def schedule_worker():
+    restock_scheduler = RestockScheduler(history)
+    next_due = {}  # pincode -> unix time of next scheduled scrape
+    pincodes = []
+    pincodes_refreshed_at = 0
+    while True:
+        now = time.time()
+        # Refresh the pincode list hourly
+        if now - pincodes_refreshed_at > 3600:
+            pincodes = _fetch_pincodes()
+            pincodes_refreshed_at = now
+        for pin in pincodes:
+            if now >= next_due.get(pin, 0):
+                _queue_scrape(pin)
+                interval = restock_scheduler.next_interval(pin, now)
+                next_due[pin] = now + interval
+                logging.info(f"Next scheduled scrape for pincode {pin} in {interval:.0f}s")
+        time.sleep(30)
 
 # Extraction of send logic into function
 
@@ -87,15 +291,11 @@ def _send_to_backend(pincode, products):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(
+            response = backend_session.post(
                 f"{BACKEND_API_BASE}/stock-changes",
-                json={
-                    'products': products,
-                    'timestamp': time.time(),
-                    'scraper_id': 'amul-scraper-1',
-                    'pincode': pincode
-                },
-                headers={'Content-Type': 'application/json'}
+                json=build_stock_changes_payload(products, pincode),
+                headers={'Content-Type': 'application/json'},
+                timeout=BACKEND_TIMEOUT
             )
             if response.status_code == 200:
                 logging.info(f"Backend processed successfully for pincode {pincode}")
@@ -104,12 +304,11 @@ def _send_to_backend(pincode, products):
                 logging.error(f"Failed send, status {response.status_code}")
         except Exception as e:
             logging.error(f"Error sending to backend: {e}")
-        time.sleep(1)
+        if attempt < max_retries - 1:
+            time.sleep(2 ** attempt)  # 1s, 2s
     return False
 
-# API endpoint to queue scrape jobs
-@app.api_route("/scrape", methods=["GET", "HEAD"])
-def trigger_scrape():
+def _fetch_pincodes():
     try:
         # Fetch pincodes from backend
         response = requests.get(f"{BACKEND_API_BASE}/pincodes")
@@ -120,20 +319,45 @@ def trigger_scrape():
                 logging.info(f"Fetched {len(pincodes)} pincodes from backend: {pincodes}")
             else:
                 logging.warning("Backend returned no pincodes, using fallback")
-                pincodes = [110036, 122003, 560001, 400001]  # Fallback to hardcoded values
+                pincodes = FALLBACK_PINCODES
         else:
             logging.error(f"Failed to fetch pincodes from backend, status: {response.status_code}")
-            pincodes = [110036, 122003, 560001, 400001]  # Fallback to hardcoded values
+            pincodes = FALLBACK_PINCODES
     except Exception as e:
         logging.error(f"Error fetching pincodes from backend: {e}")
-        pincodes = [110036, 122003, 560001, 400001]  # Fallback to hardcoded values
-    
+        pincodes = FALLBACK_PINCODES
+    return pincodes
+
+def _queue_scrape(pin):
+    """Queue a scrape job for a pincode, superseding any job still waiting for it"""
+    job_id = str(uuid.uuid4())
+    job_status[job_id] = "queued"
+    outcome, displaced = scrape_queue.put(pin, job_id)
+    if outcome == REJECTED:
+        job_status.pop(job_id, None)
+        logging.warning(f"Scrape queue full, rejected job for pincode {pin}")
+        return None
+    if displaced:
+        job_status[displaced] = "superseded"
+    return job_id
+
+# API endpoint to queue scrape jobs
+@app.api_route("/scrape", methods=["GET", "HEAD"])
+def trigger_scrape(force: bool = False):
+    # Jobs queued during warm-up wait for a driver, but once warm-up has
+    # finished without any driver they would never run
+    if startup_metrics.get('drivers_ready') == 0:
+        return JSONResponse(status_code=503, content={"error": "No scraper driver available"})
+    # The schedule already spends the scrape budget, so an external cron
+    # still hitting /scrape would add a full extra round on top of it
+    if ADAPTIVE_SCHEDULING and not force:
+        return {"jobs": [], "scheduled": True}
+    pincodes = _fetch_pincodes()
     jobs = []
     for pin in pincodes:
-        job_id = str(uuid.uuid4())
-        job_status[job_id] = "queued"
-        scrape_queue.put((job_id, pin))
-        jobs.append({"job_id": job_id, "pincode": pin})
+        job_id = _queue_scrape(pin)
+        if job_id:
+            jobs.append({"job_id": job_id, "pincode": pin})
     logging.info(f"Queued {len(jobs)} scrape jobs.")
     return {"jobs": jobs}
 
@@ -143,6 +367,69 @@ def get_status(job_id: str):
     status = job_status.get(job_id, "not_found")
     return {"job_id": job_id, "status": status}
 
+# Recent availability transitions for a pincode
+@app.get("/history/{pincode}")
+def get_history(pincode: int, product_id: str = None, since: float = None, limit: int = 100):
+    events = history.recent_history(pincode, product_id=product_id, since=since, limit=limit)
+    return {"pincode": pincode, "events": events}
+
+# Latest price, pack size and variants fetched from product pages
+@app.get("/product_details/{pincode}")
+def get_product_details(pincode: int):
+    return {"pincode": pincode, "products": history.product_details(pincode)}
+
+# Server-sent event stream of restock / sold-out transitions
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    pincode: Optional[List[int]] = Query(None),
+    product_id: Optional[List[str]] = Query(None),
+):
+    subscription = event_broker.subscribe(pincodes=pincode, product_ids=product_id)
+
+    async def event_generator():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=15)
+                if event is None:
+                    # Keep-alive comment so proxies don't close idle streams
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Negative cache and site circuit breaker state
+@app.get("/pincode_health")
+def get_pincode_health():
+    return {"negative_cache": negative_cache.snapshot(), "site_breaker": site_breaker.snapshot()}
+
+# Queue depths, coalesced / dropped counts and backend circuit state
+@app.get("/pipeline_metrics")
+def get_pipeline_metrics():
+    with pipeline_stats_lock:
+        paused_seconds = pipeline_stats['scrape_paused_seconds']
+    return {
+        "scrape_queue": scrape_queue.metrics(),
+        "backend_queue": backend_queue.metrics(),
+        "detail_queue": detail_queue.metrics(),
+        "backend_breaker": backend_breaker.snapshot(),
+        "scrape_paused": backend_breaker.is_open(),
+        "scrape_paused_seconds": round(paused_seconds, 1),
+    }
+
+# Startup and time-to-first-scrape measurements
+@app.get("/startup_metrics")
+def get_startup_metrics():
+    return startup_metrics
+
 # Simple ping
 @app.get("/ping")
 def ping():
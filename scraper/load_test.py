@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load generator for the backend's POST /stock-changes ingestion path.
+
+Builds synthetic pincodes and product catalogs, flips stock states at a
+configurable restock rate, and posts payloads built by the scraper's own
+``build_stock_changes_payload`` with configurable concurrency. Reports
+throughput, latency percentiles and error rates.
+
+Only point this at a local backend (with local Mongo and Redis): every
+payload upserts product documents and restocks enqueue email jobs.
+
+    python load_test.py --pincodes 50 --products 40 --restock-rate 0.05 --concurrency 16 --duration 60
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import httpx
+
+from stock_payload import build_stock_changes_payload
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+class SyntheticCatalog:
+    """Per-pincode product states that drift at a given restock / sell-out rate"""
+
+    def __init__(self, pincodes, products, restock_rate, seed=None):
+        self.random = random.Random(seed)
+        # 9xxxxx pincodes keep synthetic data apart from real ones
+        self.pincodes = [900000 + i for i in range(pincodes)]
+        self.catalog = [
+            {
+                'productId': f"loadtest-product-{i}",
+                'name': f"Load Test Protein Product {i}",
+                'productPageUrl': f"https://shop.amul.com/en/product/loadtest-product-{i}",
+                'productImageUrl': None,
+            }
+            for i in range(products)
+        ]
+        self.restock_rate = restock_rate
+        self.sold_out = {
+            pincode: [self.random.random() < 0.5 for _ in self.catalog]
+            for pincode in self.pincodes
+        }
+
+    def next_products(self, pincode):
+        """Advance one scrape for ``pincode`` and return its product list"""
+        states = self.sold_out[pincode]
+        for i, sold_out in enumerate(states):
+            if self.random.random() < self.restock_rate:
+                states[i] = not sold_out
+        return [dict(product, sold_out=states[i]) for i, product in enumerate(self.catalog)]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.restocks = 0
+        self.products_sent = 0
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+async def worker(client, url, catalog, pincode_queue, results, deadline, remaining):
+    while time.monotonic() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        pincode = await pincode_queue.get()
+        pincode_queue.put_nowait(pincode)
+        products = catalog.next_products(pincode)
+        payload = build_stock_changes_payload(products, pincode, scraper_id='load-test')
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload)
+            results.latencies.append(time.perf_counter() - started)
+            results.statuses[response.status_code] += 1
+            if response.status_code == 200:
+                results.products_sent += len(products)
+                results.restocks += len(response.json().get('restockedProducts', []))
+        except httpx.HTTPError as e:
+            results.latencies.append(time.perf_counter() - started)
+            results.errors[type(e).__name__] += 1
+
+
+async def run(args):
+    catalog = SyntheticCatalog(args.pincodes, args.products, args.restock_rate, seed=args.seed)
+    pincode_queue = asyncio.Queue()
+    for pincode in catalog.pincodes:
+        pincode_queue.put_nowait(pincode)
+    url = f"{args.base_url.rstrip('/')}/stock-changes"
+    results = Results()
+    remaining = [args.requests] if args.requests else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            worker(client, url, catalog, pincode_queue, results, deadline, remaining)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.monotonic() - started
+    return results, elapsed
+
+
+def report(args, results, elapsed):
+    total = sum(results.statuses.values()) + sum(results.errors.values())
+    ok = results.statuses.get(200, 0)
+    failed = total - ok
+    print(f"Target:        {args.base_url.rstrip('/')}/stock-changes")
+    print(f"Load:          {args.pincodes} pincodes x {args.products} products, "
+          f"restock rate {args.restock_rate}, concurrency {args.concurrency}")
+    print(f"Requests:      {total} in {elapsed:.1f}s ({total / elapsed:.1f} req/s, "
+          f"{results.products_sent / elapsed:.0f} products/s)")
+    print(f"Errors:        {failed} ({(failed / total * 100) if total else 0:.2f}%)")
+    for status, count in sorted(results.statuses.items()):
+        if status != 200:
+            print(f"  HTTP {status}: {count}")
+    for name, count in results.errors.most_common():
+        print(f"  {name}: {count}")
+    print(f"Restocks:      {results.restocks} reported by the backend")
+    print("Latency (ms):  " + "  ".join(
+        f"p{pct}={results.percentile(pct) * 1000:.0f}" for pct in (50, 90, 95, 99)
+    ) + f"  max={max(results.latencies, default=0) * 1000:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the backend /stock-changes endpoint')
+    parser.add_argument('--base-url', default='http://localhost:8000/api', help='Backend API base URL')
+    parser.add_argument('--pincodes', type=int, default=20, help='Number of synthetic pincodes')
+    parser.add_argument('--products', type=int, default=30, help='Products per pincode catalog')
+    parser.add_argument('--restock-rate', type=float, default=0.05,
+                        help='Probability that a product flips stock state on each scrape')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent in-flight requests')
+    parser.add_argument('--duration', type=float, default=30, help='Test duration in seconds')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='Allow a non-local backend (writes synthetic data and may enqueue emails)')
+    args = parser.parse_args()
+
+    if urlparse(args.base_url).hostname not in LOCAL_HOSTS and not args.allow_remote:
+        print(f"Refusing to load test non-local backend {args.base_url} without --allow-remote")
+        sys.exit(1)
+
+    results, elapsed = asyncio.run(run(args))
+    report(args, results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
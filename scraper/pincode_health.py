@@ -0,0 +1,79 @@
+"""
+Failure classes for pincode scrapes and a persisted negative cache.
+
+``enter_pincode`` sets ``AmulScraper.last_failure`` to one of the classes
+below. Unserviceable pincodes (the site doesn't list them) go into a negative
+cache and are skipped until an exponentially growing re-check time, so
+workers don't sit through every dropdown timeout on each trigger.
+"""
+
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+from config import (
+    NEGATIVE_CACHE_PATH,
+    NEGATIVE_CACHE_BASE_INTERVAL,
+    NEGATIVE_CACHE_MAX_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# The site doesn't offer the pincode: skip it for a while
+UNSERVICEABLE = 'unserviceable'
+# Timeouts, WebDriver hiccups, click failures: retry soon
+TRANSIENT = 'transient'
+# Expected page elements are missing: the site layout probably changed
+SITE_CHANGED = 'site_changed'
+
+
+class NegativeCache:
+    """Pincodes known to be unserviceable, with exponential re-check intervals"""
+
+    def __init__(self, path=None, base_interval=None, max_interval=None):
+        self.path = path or NEGATIVE_CACHE_PATH
+        self.base_interval = base_interval or NEGATIVE_CACHE_BASE_INTERVAL
+        self.max_interval = max_interval or NEGATIVE_CACHE_MAX_INTERVAL
+        self._lock = Lock()
+        self._entries = {}  # pincode (str) -> {'failures', 'next_check'}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load negative cache {self.path}: {e}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def should_skip(self, pincode, now=None):
+        """True while an unserviceable pincode is waiting for its next re-check"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._entries.get(str(pincode))
+        return bool(entry) and now < entry['next_check']
+
+    def record_unserviceable(self, pincode, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._entries.setdefault(str(pincode), {'failures': 0, 'next_check': 0})
+            entry['failures'] += 1
+            interval = min(self.max_interval, self.base_interval * 2 ** (entry['failures'] - 1))
+            entry['next_check'] = now + interval
+            self._save()
+        logger.info(f"Pincode {pincode} is unserviceable; re-checking in {interval / 3600:.1f}h")
+
+    def record_success(self, pincode):
+        with self._lock:
+            if self._entries.pop(str(pincode), None) is not None:
+                self._save()
+                logger.info(f"Pincode {pincode} is serviceable again")
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._entries)
@@ -0,0 +1,116 @@
+"""
+Bounded, keyed queue used between the scrape and backend-send stages.
+
+Items are keyed (by pincode). Putting an item whose key is already waiting
+replaces the pending item in place, so a newer snapshot never queues behind an
+older one for the same pincode. When the queue is full, the overflow policy
+decides whether the oldest entry is dropped or the new one is rejected. Memory
+therefore stays bounded however long a downstream stage is stalled.
+"""
+
+from collections import OrderedDict
+from threading import Condition
+
+QUEUED = 'queued'
+COALESCED = 'coalesced'
+DROPPED_OLDEST = 'dropped_oldest'
+REJECTED = 'rejected'
+
+DROP_OLDEST = 'drop_oldest'
+REJECT = 'reject'
+
+
+class BoundedDict(OrderedDict):
+    """Dict that evicts its oldest key once ``maxlen`` keys are stored"""
+
+    def __init__(self, maxlen):
+        super().__init__()
+        self.maxlen = maxlen
+
+    def __setitem__(self, key, value):
+        if key not in self and len(self) >= self.maxlen:
+            self.popitem(last=False)
+        super().__setitem__(key, value)
+
+
+class CoalescingQueue:
+    def __init__(self, name, maxsize, overflow=DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, REJECT):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.name = name
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._items = OrderedDict()  # key -> item, oldest first
+        self._closed = False
+        self._cond = Condition()
+        self.stats = {'enqueued': 0, 'coalesced': 0, 'dropped': 0, 'rejected': 0, 'max_depth': 0}
+
+    def put(self, key, item):
+        """Add or replace the pending item for ``key``.
+
+        Returns ``(outcome, displaced)`` where ``displaced`` is the item that was
+        replaced or dropped to make room, if any.
+        """
+        with self._cond:
+            displaced = None
+            if key in self._items:
+                displaced = self._items[key]
+                self._items[key] = item
+                outcome = COALESCED
+                self.stats['coalesced'] += 1
+            elif len(self._items) >= self.maxsize:
+                if self.overflow == REJECT:
+                    self.stats['rejected'] += 1
+                    return REJECTED, None
+                _, displaced = self._items.popitem(last=False)
+                self._items[key] = item
+                outcome = DROPPED_OLDEST
+                self.stats['dropped'] += 1
+            else:
+                self._items[key] = item
+                outcome = QUEUED
+            self.stats['enqueued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._items))
+            self._cond.notify()
+            return outcome, displaced
+
+    def requeue(self, key, item):
+        """Put a held item back at the front unless a newer one is already waiting.
+
+        Returns QUEUED if the item was requeued, COALESCED if it is now stale, or
+        DROPPED_OLDEST if the queue filled up meanwhile (the held item is the
+        oldest, so it is the one dropped).
+        """
+        with self._cond:
+            if key in self._items:
+                self.stats['coalesced'] += 1
+                return COALESCED
+            if len(self._items) >= self.maxsize:
+                self.stats['dropped'] += 1
+                return DROPPED_OLDEST
+            self._items[key] = item
+            self._items.move_to_end(key, last=False)
+            self._cond.notify()
+            return QUEUED
+
+    def get(self, timeout=None):
+        """Block for the oldest ``(key, item)``; returns None once closed and drained"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            return self._items.popitem(last=False)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def metrics(self):
+        with self._cond:
+            return dict(self.stats, depth=len(self._items), maxsize=self.maxsize, overflow=self.overflow)
@@ -0,0 +1,178 @@
+"""
+Optional product detail stage for the scraper.
+
+The grid page only tells us whether a product is sold out. This module follows
+each product's ``productPageUrl`` concurrently over a pooled ``requests.Session``
+to pick up price, pack size and variant availability. The browser's cookies
+(which carry the selected pincode) are passed with each request rather than
+stored on the session, so pincodes don't leak into each other. Responses are
+cached per pincode with their ETag / Last-Modified validators, so a page that
+hasn't changed since the last cycle costs only a 304.
+"""
+
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from config import DETAIL_FETCH_CONCURRENCY, DETAIL_FETCH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+PACK_SIZE_PATTERN = re.compile(
+    r"(?:pack\s+of\s+\d+|\d+(?:\.\d+)?\s*(?:g|gm|kg|ml|l|ltr)\b(?:\s*[x×]\s*\d+)?)",
+    re.IGNORECASE,
+)
+
+
+def _parse_price(value):
+    if value is None:
+        return None
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(value))
+    return float(match.group(0).replace(',', '')) if match else None
+
+
+def _in_stock(availability):
+    if availability is None:
+        return None
+    return 'instock' in str(availability).lower().replace(' ', '').replace('_', '')
+
+
+def parse_product_page(html):
+    """Extract price, pack size and variants from a product page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    details = {'price': None, 'packSize': None, 'variants': []}
+
+    # Structured data is the most stable source when the page provides it
+    for script in soup.select('script[type="application/ld+json"]'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict) or item.get('@type') not in ('Product', 'ProductGroup'):
+                continue
+            offers = item.get('offers') or []
+            offers = offers if isinstance(offers, list) else [offers]
+            for offer in offers:
+                if isinstance(offer, dict) and details['price'] is None:
+                    details['price'] = _parse_price(offer.get('price') or offer.get('lowPrice'))
+            if item.get('size') and not details['packSize']:
+                details['packSize'] = str(item['size'])
+            variants = item.get('hasVariant') or []
+            for variant in variants if isinstance(variants, list) else [variants]:
+                if not isinstance(variant, dict):
+                    continue
+                variant_offer = variant.get('offers') or {}
+                if isinstance(variant_offer, list):
+                    variant_offer = variant_offer[0] if variant_offer else {}
+                if not isinstance(variant_offer, dict):
+                    variant_offer = {}
+                details['variants'].append({
+                    'name': variant.get('name'),
+                    'sku': variant.get('sku'),
+                    'price': _parse_price(variant_offer.get('price')),
+                    'in_stock': _in_stock(variant_offer.get('availability')),
+                })
+
+    # Fall back to meta tags and visible markup
+    if details['price'] is None:
+        meta = soup.select_one('meta[property="product:price:amount"], meta[itemprop="price"]')
+        if meta:
+            details['price'] = _parse_price(meta.get('content'))
+    if details['price'] is None:
+        price_elem = soup.select_one('.product-price, .price, [class*="price"]')
+        if price_elem:
+            details['price'] = _parse_price(price_elem.get_text())
+    if not details['packSize']:
+        title = soup.select_one('h1')
+        match = PACK_SIZE_PATTERN.search(title.get_text(' ', strip=True) if title else '')
+        if match:
+            details['packSize'] = match.group(0)
+    return details
+
+
+class ProductDetailCrawler:
+    """Fetches product pages with bounded concurrency and conditional requests"""
+
+    def __init__(self, session, max_workers=None, timeout=None):
+        self.session = session
+        self.max_workers = max_workers or DETAIL_FETCH_CONCURRENCY
+        self.timeout = timeout or DETAIL_FETCH_TIMEOUT
+        # Make sure the connection pool is at least as large as the worker pool
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._cache = {}  # (pincode, url) -> {'etag', 'last_modified', 'details'}
+        self._lock = Lock()
+        self.stats = {'fetched': 0, 'not_modified': 0, 'errors': 0}
+
+    def fetch(self, url, pincode=None, cookies=None, headers=None):
+        """Return parsed details for one product page, or None on error"""
+        key = (pincode, url)
+        with self._lock:
+            cached = self._cache.get(key)
+        headers = dict(headers or {})
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            response = self.session.get(url, headers=headers, cookies=cookies, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Error fetching product page {url}: {e}")
+            self._count('errors')
+            return cached['details'] if cached else None
+
+        if response.status_code == 304 and cached:
+            self._count('not_modified')
+            return cached['details']
+        if response.status_code != 200:
+            logger.warning(f"Product page {url} returned {response.status_code}")
+            self._count('errors')
+            return cached['details'] if cached else None
+
+        try:
+            details = parse_product_page(response.text)
+        except Exception as e:
+            logger.warning(f"Could not parse product page {url}: {e}")
+            self._count('errors')
+            return cached['details'] if cached else None
+        with self._lock:
+            self._cache[key] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'details': details,
+            }
+        self._count('fetched')
+        return details
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def enrich(self, products, pincode=None, cookies=None, headers=None):
+        """Fetch detail pages for all products and merge the fields in place"""
+        targets = [product for product in products if product.get('productPageUrl')]
+        if not targets:
+            return products
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(
+                lambda product: self.fetch(product['productPageUrl'], pincode, cookies, headers),
+                targets
+            )
+            for product, details in zip(targets, results):
+                if details:
+                    product.update(details)
+        logger.info(
+            f"Fetched details for {len(targets)} products in {time.time() - started:.2f}s "
+            f"(totals: {self.stats})"
+        )
+        return products
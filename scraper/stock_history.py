@@ -0,0 +1,251 @@
+"""
+Local stock history for the scraper.
+
+Every scrape is diffed against the last known state of each product and only
+availability *transitions* are stored, in a small SQLite database with compact
+integer rows. The recorded restocks are used to learn when each pincode
+usually gets restocked, so the scheduler can scrape more often inside those
+windows and less often outside them while keeping the same average rate.
+
+The latest price, pack size and variants fetched from product pages are kept
+alongside, since the backend doesn't store them.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from threading import Lock
+
+from config import (
+    HISTORY_DB_PATH,
+    HISTORY_LOOKBACK_DAYS,
+    HISTORY_TZ_OFFSET_MINUTES,
+    SCRAPE_BASE_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 7 * 24
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS last_state (
+    pincode INTEGER NOT NULL,
+    product INTEGER NOT NULL,
+    sold_out INTEGER NOT NULL,
+    seen_at INTEGER NOT NULL,
+    PRIMARY KEY (pincode, product)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transitions (
+    pincode INTEGER NOT NULL,
+    product INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    sold_out INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_pincode_ts ON transitions (pincode, ts);
+CREATE TABLE IF NOT EXISTS product_details (
+    pincode INTEGER NOT NULL,
+    product INTEGER NOT NULL,
+    price REAL,
+    pack_size TEXT,
+    variants TEXT,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (pincode, product)
+) WITHOUT ROWID;
+"""
+
+
+class StockHistory:
+    """Append-only store of per-pincode, per-product availability transitions"""
+
+    def __init__(self, path=None):
+        self.path = path or HISTORY_DB_PATH
+        self._lock = Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._product_ids = {}  # productId -> integer key
+        for key, product_id in self._conn.execute("SELECT id, product_id FROM products"):
+            self._product_ids[product_id] = key
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _product_key(self, product_id):
+        key = self._product_ids.get(product_id)
+        if key is None:
+            cursor = self._conn.execute("INSERT INTO products (product_id) VALUES (?)", (product_id,))
+            key = cursor.lastrowid
+            self._product_ids[product_id] = key
+        return key
+
+    def record_scrape(self, pincode, products, timestamp=None):
+        """Store a scrape result and return the availability transitions it contained.
+
+        The first observation of a product only seeds its state; a transition is
+        returned when a known product flips between sold out and in stock.
+        """
+        ts = int(timestamp if timestamp is not None else time.time())
+        pincode = int(pincode)
+        transitions = []
+        with self._lock, self._conn:
+            previous = dict(self._conn.execute(
+                "SELECT product, sold_out FROM last_state WHERE pincode = ?", (pincode,)
+            ).fetchall())
+            for product in products:
+                product_id = product.get('productId')
+                if not product_id:
+                    continue
+                key = self._product_key(product_id)
+                sold_out = 1 if product.get('sold_out') else 0
+                was_sold_out = previous.get(key)
+                if was_sold_out is not None and was_sold_out != sold_out:
+                    self._conn.execute(
+                        "INSERT INTO transitions (pincode, product, ts, sold_out) VALUES (?, ?, ?, ?)",
+                        (pincode, key, ts, sold_out)
+                    )
+                    transitions.append({
+                        'pincode': pincode,
+                        'productId': product_id,
+                        'name': product.get('name'),
+                        'timestamp': ts,
+                        'event': 'sold_out' if sold_out else 'restock'
+                    })
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO last_state (pincode, product, sold_out, seen_at) VALUES (?, ?, ?, ?)",
+                    (pincode, key, sold_out, ts)
+                )
+        if transitions:
+            logger.info(f"Recorded {len(transitions)} stock transitions for pincode {pincode}")
+        return transitions
+
+    def record_details(self, pincode, products, timestamp=None):
+        """Store the latest price, pack size and variants of each enriched product"""
+        ts = int(timestamp if timestamp is not None else time.time())
+        pincode = int(pincode)
+        stored = 0
+        with self._lock, self._conn:
+            for product in products:
+                product_id = product.get('productId')
+                if not product_id or ('price' not in product and 'packSize' not in product):
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO product_details "
+                    "(pincode, product, price, pack_size, variants, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (pincode, self._product_key(product_id), product.get('price'), product.get('packSize'),
+                     json.dumps(product.get('variants') or []), ts)
+                )
+                stored += 1
+        return stored
+
+    def product_details(self, pincode):
+        """Return the latest stored details for every product of a pincode"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.product_id, d.price, d.pack_size, d.variants, d.updated_at FROM product_details d "
+                "JOIN products p ON p.id = d.product WHERE d.pincode = ? ORDER BY p.product_id",
+                (int(pincode),)
+            ).fetchall()
+        return [
+            {
+                'productId': product_id,
+                'price': price,
+                'packSize': pack_size,
+                'variants': json.loads(variants) if variants else [],
+                'updatedAt': updated_at
+            }
+            for product_id, price, pack_size, variants, updated_at in rows
+        ]
+
+    def recent_history(self, pincode, product_id=None, since=None, limit=100):
+        """Return the most recent transitions for a pincode, newest first"""
+        query = (
+            "SELECT p.product_id, t.ts, t.sold_out FROM transitions t "
+            "JOIN products p ON p.id = t.product WHERE t.pincode = ?"
+        )
+        params = [int(pincode)]
+        if product_id:
+            query += " AND p.product_id = ?"
+            params.append(product_id)
+        if since is not None:
+            query += " AND t.ts >= ?"
+            params.append(int(since))
+        query += " ORDER BY t.ts DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                'productId': product_id,
+                'timestamp': ts,
+                'event': 'sold_out' if sold_out else 'restock'
+            }
+            for product_id, ts, sold_out in rows
+        ]
+
+    def restock_profile(self, pincode, lookback_days=None, now=None):
+        """Count restocks per hour-of-week (local time) over the lookback window"""
+        lookback_days = lookback_days if lookback_days is not None else HISTORY_LOOKBACK_DAYS
+        now = now if now is not None else time.time()
+        since = int(now - lookback_days * 86400)
+        offset = HISTORY_TZ_OFFSET_MINUTES * 60
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ((ts + ?) / 3600) % ?, COUNT(*) FROM transitions "
+                "WHERE pincode = ? AND sold_out = 0 AND ts >= ? GROUP BY 1",
+                (offset, HOURS_PER_WEEK, int(pincode), since)
+            ).fetchall()
+        profile = [0] * HOURS_PER_WEEK
+        for hour, count in rows:
+            profile[int(hour)] = count
+        return profile
+
+
+class RestockScheduler:
+    """Decides how long to wait before scraping a pincode again.
+
+    Scrape rate in each hour-of-week is made proportional to the smoothed
+    restock frequency for that hour, normalised so the mean rate equals one
+    scrape per ``base_interval``. Pincodes without history get the base
+    interval everywhere.
+    """
+
+    def __init__(self, history, base_interval=None, min_factor=0.25, max_factor=4.0):
+        self.history = history
+        self.base_interval = base_interval or SCRAPE_BASE_INTERVAL
+        self.min_interval = self.base_interval * min_factor
+        self.max_interval = self.base_interval * max_factor
+
+    def _weights(self, pincode, now):
+        profile = self.history.restock_profile(pincode, now=now)
+        if not any(profile):
+            return None
+        # Add-one smoothing, then spread each hour into its neighbours so a
+        # restock at 10:05 also raises the 09:00 and 11:00 slots
+        smoothed = []
+        for hour in range(HOURS_PER_WEEK):
+            smoothed.append(
+                1.0
+                + profile[hour]
+                + 0.5 * profile[(hour - 1) % HOURS_PER_WEEK]
+                + 0.5 * profile[(hour + 1) % HOURS_PER_WEEK]
+            )
+        mean = sum(smoothed) / HOURS_PER_WEEK
+        return [value / mean for value in smoothed]
+
+    def next_interval(self, pincode, now=None):
+        """Seconds to wait before the next scrape of ``pincode``"""
+        now = now if now is not None else time.time()
+        weights = self._weights(pincode, now)
+        if weights is None:
+            return self.base_interval
+        offset = HISTORY_TZ_OFFSET_MINUTES * 60
+        hour = int((now + offset) // 3600) % HOURS_PER_WEEK
+        interval = self.base_interval / weights[hour]
+        return max(self.min_interval, min(self.max_interval, interval))
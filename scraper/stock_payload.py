@@ -0,0 +1,19 @@
+"""
+Payload sent to the backend's POST /stock-changes endpoint.
+
+Kept in its own light module so the scraper, the FastAPI server and the load
+generator all build exactly the same request without importing Selenium.
+"""
+
+import time
+
+SCRAPER_ID = 'amul-scraper-1'
+
+
+def build_stock_changes_payload(products, pincode, scraper_id=SCRAPER_ID, timestamp=None):
+    return {
+        'products': products,
+        'timestamp': timestamp if timestamp is not None else time.time(),
+        'scraper_id': scraper_id,
+        'pincode': pincode
+    }